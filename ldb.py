@@ -14,11 +14,12 @@ import io
 import re
 import sys
 import bdb
+import types
 import dis
-import code
-import glob
-import pprint
 import signal
+import reprlib
+import itertools
+import collections
 import inspect
 import tokenize
 import functools
@@ -26,8 +27,7 @@ import traceback
 import linecache
 import dataclasses
 import enum
-import xmlrpc.client
-import xmlrpc.server
+import _thread
 
 from typing import Union, Any, Callable
 
@@ -52,13 +52,13 @@ class DebugActionResult:
     status: ResultStatus = ResultStatus.SUCCESS
     message: str = ""
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Variable:
     name: str
     value: str
     python_type: str
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Frame:
     file_name: str
     line_number: int
@@ -67,11 +67,38 @@ class Frame:
     global_variables: list[Variable]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Snapshot:
     stack: list[Frame]
 
 
+def _snapshot_dict(snapshot):
+    """Return *snapshot* as the dictionary sent to the interface.
+
+    Same result as dataclasses.asdict(), without its recursive deep copy of
+    every field, which costs several times more for a snapshot with many
+    variables.
+    """
+    def variable_dicts(variables):
+        return [
+            {"name": v.name, "value": v.value, "python_type": v.python_type}
+            for v in variables
+        ]
+
+    return {
+        "stack": [
+            {
+                "file_name": frame.file_name,
+                "line_number": frame.line_number,
+                "function_name": frame.function_name,
+                "local_variables": variable_dicts(frame.local_variables),
+                "global_variables": variable_dicts(frame.global_variables),
+            }
+            for frame in snapshot.stack
+        ]
+    }
+
+
 class Restart(Exception):
     """Causes a debugger to be restarted for the debugged python program."""
     pass
@@ -113,6 +140,265 @@ def lasti2lineno(code, lasti):
     return 0
 
 
+# File names of the code that makes up the debugger itself. Matching them
+# exactly is a single hash lookup, and unlike a substring test it doesn't
+# hide user files such as "mybdb.py".
+_DEBUGGER_FILES = frozenset(
+    sys.intern(file_name)
+    for file_name in ("<frozen runpy>", __file__, bdb.__file__)
+)
+
+
+def _is_debugger_code(code):
+    """Return True if *code* belongs to the debugger rather than the debuggee."""
+    return code.co_filename in _DEBUGGER_FILES
+
+
+# On Python 3.12+ stepping uses sys.monitoring (PEP 669), which only
+# instruments the code objects we are interested in, instead of calling
+# back into Python for every line of every frame like sys.settrace does.
+# Older versions fall back to bdb's settrace based stepping.
+_MONITORING = sys.version_info >= (3, 12)
+_MONITORING_TOOL_NAME = "lazy-pdb"
+_monitored_code = set()
+# Whether a callback returned DISABLE since the last stop. Restarting events
+# also turns back on the ones other tools (e.g. coverage) disabled, so it is
+# only done when needed.
+_disabled_locations = False
+
+
+def _claim_monitoring():
+    """Reserve the debugger tool id, returning False if another tool has it."""
+    owner = sys.monitoring.get_tool(sys.monitoring.DEBUGGER_ID)
+    if owner is None:
+        sys.monitoring.use_tool_id(sys.monitoring.DEBUGGER_ID, _MONITORING_TOOL_NAME)
+        return True
+    return owner == _MONITORING_TOOL_NAME
+
+
+def _disable_location():
+    """Return DISABLE from a callback, noting that events need a restart."""
+    global _disabled_locations
+    _disabled_locations = True
+    return sys.monitoring.DISABLE
+
+
+def _stop_monitoring():
+    """Turn off every event enabled by a previous step, next or continue."""
+    global _disabled_locations
+    if not _MONITORING:
+        return
+    if sys.monitoring.get_tool(sys.monitoring.DEBUGGER_ID) != _MONITORING_TOOL_NAME:
+        return
+    sys.monitoring.set_events(sys.monitoring.DEBUGGER_ID, 0)
+    while _monitored_code:
+        sys.monitoring.set_local_events(sys.monitoring.DEBUGGER_ID, _monitored_code.pop(), 0)
+    # Locations that returned DISABLE have to report again next time.
+    if _disabled_locations:
+        _disabled_locations = False
+        sys.monitoring.restart_events()
+
+
+# The trace function that was installed before the debugger, e.g. by
+# coverage.py. When we stop tracing it is put back instead of None, so the
+# outer tool keeps running after a continue.
+_outer_trace = sys.gettrace()
+if isinstance(getattr(_outer_trace, "__self__", None), bdb.Bdb):
+    # Imported by breakpoint() while another debugger was tracing.
+    _outer_trace = None
+
+
+# The breakpoint hook that was active before we started stepping, see
+# Ldb._stepping_breakpointhook.
+_saved_breakpointhook = None
+
+
+def _restore_breakpointhook():
+    global _saved_breakpointhook
+    if _saved_breakpointhook is not None:
+        sys.breakpointhook = _saved_breakpointhook
+        _saved_breakpointhook = None
+
+
+# Values are shown on a single line of the variables panel, so there is no
+# point in formatting more than this many characters of them.
+_MAX_VALUE_LENGTH = 200
+
+# Ints with more bits than this have more digits than can be shown, and
+# str() takes quadratic time on them (and refuses past 4300 digits).
+_MAX_INT_BITS = _MAX_VALUE_LENGTH * 10 // 3
+
+# reprlib stops walking a container once the output is long enough, where
+# str() would format the whole thing first. Each nesting level multiplies the
+# number of items visited, so only a few levels are shown, and strings and
+# other values inside containers get less room than top-level ones.
+class _ValueRepr(reprlib.Repr):
+    """reprlib.Repr that also bounds the dict subclasses from collections.
+
+    Repr looks methods up by type name and falls back to the full repr() for
+    types it has none for, which these would otherwise get.
+    """
+
+    def repr_dict(self, x, level):
+        # Repr sorts every key to show the first few. Taking them in insertion
+        # order, like str() shows them, only visits the ones shown.
+        if not x:
+            return "{}"
+        if level <= 0:
+            return "{...}"
+        pieces = [
+            f"{self.repr1(key, level - 1)}: {self.repr1(x[key], level - 1)}"
+            for key in itertools.islice(x, self.maxdict)
+        ]
+        if len(x) > self.maxdict:
+            pieces.append(self.fillvalue)
+        return "{" + ", ".join(pieces) + "}"
+
+    def _repr_unsorted(self, x, level, left, right, maxiter):
+        # Same as repr_dict: Repr sorts a set to show the first few items.
+        if level <= 0:
+            return left + self.fillvalue + right
+        pieces = [self.repr1(item, level - 1) for item in itertools.islice(x, maxiter)]
+        if len(x) > maxiter:
+            pieces.append(self.fillvalue)
+        return left + ", ".join(pieces) + right
+
+    def repr_set(self, x, level):
+        if not x:
+            return "set()"
+        return self._repr_unsorted(x, level, "{", "}", self.maxset)
+
+    def repr_frozenset(self, x, level):
+        if not x:
+            return "frozenset()"
+        return self._repr_unsorted(x, level, "frozenset({", "})", self.maxfrozenset)
+
+    def _repr_dict_subclass(self, x, level, arguments=""):
+        if not isinstance(x, dict):
+            # Some other type with the same name.
+            return self.repr_instance(x, level)
+        return f"{type(x).__name__}({arguments}{self.repr_dict(x, level)})"
+
+    def repr_defaultdict(self, x, level):
+        if not isinstance(x, collections.defaultdict):
+            return self.repr_instance(x, level)
+        factory = self.repr1(x.default_factory, level - 1)
+        return self._repr_dict_subclass(x, level, f"{factory}, ")
+
+    def repr_OrderedDict(self, x, level):
+        return self._repr_dict_subclass(x, level)
+
+    def repr_Counter(self, x, level):
+        return self._repr_dict_subclass(x, level)
+
+
+_value_repr = _ValueRepr()
+_value_repr.maxlevel = 3
+_value_repr.maxstring = 40
+_value_repr.maxother = 40
+_value_repr.maxlist = 6
+_value_repr.maxtuple = 6
+_value_repr.maxset = 6
+_value_repr.maxfrozenset = 6
+_value_repr.maxdeque = 6
+_value_repr.maxdict = 6
+
+_SCALAR_TYPES = frozenset({int, float, complex, bool, type(None)})
+_CONTAINER_TYPES = frozenset({
+    list,
+    tuple,
+    dict,
+    set,
+    frozenset,
+    collections.deque,
+    collections.defaultdict,
+    collections.OrderedDict,
+    collections.Counter,
+})
+_BYTES_TYPES = frozenset({bytes, bytearray})
+
+# Other names that are never shown as variables (site's helper builtins).
+_IGNORED_VARIABLES = frozenset({"copyright", "license"})
+
+# Imported modules, functions and classes aren't shown as variables. The
+# common types are checked exactly first, which is much cheaper than the
+# isinstance() check that catches the rest.
+_HIDDEN_TYPES = frozenset({
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    type,
+})
+
+
+def _format_value(value):
+    """Return the text shown for *value*, at most about _MAX_VALUE_LENGTH long."""
+    value_type = type(value)
+    if value_type in _SCALAR_TYPES:
+        if value_type is int and value.bit_length() > _MAX_INT_BITS:
+            return f"<int with about {int(value.bit_length() * 0.30103) + 1} digits>"
+        return str(value)
+    if value_type in _CONTAINER_TYPES:
+        text = _value_repr.repr(value)
+    elif value_type in _BYTES_TYPES:
+        # Only format the bytes that can be shown.
+        text = repr(value[:_MAX_VALUE_LENGTH])
+    elif value_type is str:
+        text = value
+    else:
+        text = str(value)
+    if len(text) > _MAX_VALUE_LENGTH:
+        text = text[: _MAX_VALUE_LENGTH - 3] + "..."
+    return text
+
+
+# Names of the types of shown values, by type. A session only sees a few
+# dozen types, so this stays small. The builtins most values have are
+# there from the start.
+_type_names = {
+    value_type: value_type.__name__
+    for value_type in _SCALAR_TYPES | _CONTAINER_TYPES | _BYTES_TYPES | {str}
+}
+
+
+def _type_name(value_type):
+    """Return the name shown for values of *value_type*."""
+    name = _type_names.get(value_type)
+    if name is None:
+        name = _type_names[value_type] = value_type.__name__
+    return name
+
+
+# Proxy for the interface's server. It is kept between stops (and between
+# Ldb instances, as every breakpoint() makes a new one) so that its HTTP
+# connection can be reused.
+_interface = None
+
+
+def _interface_proxy():
+    global _interface
+    if _interface is None:
+        # xmlrpc pulls in http, email and ssl; only pay for that once we stop.
+        import xmlrpc.client
+
+        _interface = xmlrpc.client.ServerProxy("http://127.0.0.1:8080")
+    return _interface
+
+
+@functools.cache
+def _setup_readline():
+    """Load readline if it exists. Every breakpoint() makes a new Ldb, but
+    the import (or the failed search for it) only has to happen once."""
+    try:
+        import readline
+
+        # remove some common file name delimiters
+        readline.set_completer_delims(" \t\n`@#$%^&*()=+[{]}\\|;:'\",<>?")
+    except ImportError:
+        pass
+
+
 class _rstr(str):
     """String that doesn't quote its repr."""
 
@@ -152,8 +438,10 @@ class _ScriptTarget(str):
 
     @property
     def code(self):
+        # Compile the script directly rather than wrapping its source in an
+        # exec() string, which made every run parse the source twice.
         with io.open_code(self) as fp:
-            return f"exec(compile({fp.read()!r}, {self!r}, 'exec'))"
+            return compile(fp.read(), str(self), "exec")
 
 
 class _ModuleTarget(str):
@@ -218,16 +506,13 @@ class Ldb(bdb.Bdb):
         self.mainpyfile = ""
         self._wait_for_mainpyfile = False
         self.tb_lineno = {}
-        # Try to load readline if it exists
-        try:
-            import readline
-
-            # remove some common file name delimiters
-            readline.set_completer_delims(" \t\n`@#$%^&*()=+[{]}\\|;:'\",<>?")
-        except ImportError:
-            pass
+        _setup_readline()
         self.allow_kbdint = False
         self.nosigint = nosigint
+        self._monitored_frame = None
+        self._monitored_thread = None
+        self._lines_off_frame = None
+        self._post_mortem = False
 
         # Read ~/.pdbrc and ./.pdbrc
         self.rcLines = []
@@ -309,6 +594,23 @@ class Ldb(bdb.Bdb):
 
     # Override Bdb methods
 
+    def set_continue(self):
+        bdb.Bdb.set_continue(self)
+        if not self.breaks:
+            # Bdb removed the trace function altogether.
+            sys.settrace(_outer_trace)
+
+    def set_quit(self):
+        bdb.Bdb.set_quit(self)
+        sys.settrace(_outer_trace)
+
+    def dispatch_call(self, frame, arg):
+        # Returning None leaves the debugger's own frames untraced for the
+        # rest of their life instead of dispatching every line into them.
+        if self.botframe is not None and _is_debugger_code(frame.f_code):
+            return None
+        return bdb.Bdb.dispatch_call(self, frame, arg)
+
     def user_call(self, frame, argument_list):
         """This method is called when there is the remote possibility
         that we ever need to stop in this function."""
@@ -346,9 +648,6 @@ class Ldb(bdb.Bdb):
             self.lastcmd = lastcmd_back
             if not self.commands_silent[currentbp]:
                 self.print_stack_entry(self.stack[self.curindex])
-            if self.commands_doprompt[currentbp]:
-                pass
-                # self._cmdloop()
             self.forget()
             return
         return 1
@@ -379,40 +678,17 @@ class Ldb(bdb.Bdb):
         self.message("%s%s" % (prefix, self._format_exc(exc_value)))
         self.interaction(frame, exc_traceback)
 
-    # General interaction function
-    def _cmdloop(self):
-        while True:
-            try:
-                # keyboard interrupts allow for an easy way to cancel
-                # the current command, so allow them during interactive input
-                self.allow_kbdint = True
-                # self.cmdloop()
-                self.allow_kbdint = False
-                break
-            except KeyboardInterrupt:
-                self.message("--KeyboardInterrupt--")
-
-    # Called before loop, handles display expressions
-    def preloop(self):
-        displaying = self.displaying.get(self.curframe)
-        if displaying:
-            for expr, oldvalue in displaying.items():
-                newvalue = self._getval_except(expr)
-                # check for identity first; this prevents custom __eq__ to
-                # be called at every loop, and also prevents instances whose
-                # fields are changed to be displayed
-                if newvalue is not oldvalue and newvalue != oldvalue:
-                    displaying[expr] = newvalue
-                    self.message(
-                        "display %s: %r  [old: %r]" % (expr, newvalue, oldvalue)
-                    )
-
     def broadcast_snapshot(self):
         snapshot = self.construct_snapshot()
-        snapshot_dictionary = dataclasses.asdict(snapshot)
-        proxy = xmlrpc.client.ServerProxy("http://127.0.0.1:8080")
-        
-        proxy.update_snapshot(snapshot_dictionary)
+        snapshot_dictionary = _snapshot_dict(snapshot)
+        _interface_proxy().update_snapshot(snapshot_dictionary)
+
+    # The method that carries out each action the interface can request.
+    _action_handlers = {
+        DebugAction.CONTINUE: "continue_to_next_breakpoint",
+        DebugAction.NEXT: "next_line",
+        DebugAction.STOP: "stop_debugger",
+    }
 
     def receive_xml_rpc(self, data):
         try:
@@ -422,16 +698,14 @@ class Ldb(bdb.Bdb):
         except ValueError:
             return DebugActionResult(data["requested_action"], [], status=ResultStatus.ERROR, message="Unknown action")
 
-        if requested_action == DebugAction.CONTINUE:
-            return self.continue_to_next_breakpoint()
-        if requested_action == DebugAction.NEXT:
-            return self.next_line()
-        if requested_action == DebugAction.STOP:
-            return self.stop_debugger()
-
-        return DebugActionResult(requested_action, [], status=ResultStatus.ERROR, message="Unknown action")
+        handler = self._action_handlers.get(requested_action)
+        if handler is None:
+            return DebugActionResult(requested_action, [], status=ResultStatus.ERROR, message="Unknown action")
+        return getattr(self, handler)()
 
     def wait_for_instruction(self):
+        import xmlrpc.server
+
         rpc_server = xmlrpc.server.SimpleXMLRPCServer(("127.0.0.1", 8081), logRequests=False)
         rpc_server.register_function(self.receive_xml_rpc, "interact_with_debugger")
 
@@ -441,6 +715,15 @@ class Ldb(bdb.Bdb):
             sys.exit(0)
 
     def interaction(self, frame, traceback):
+        # Whatever made us stop, a pending step or next is now finished.
+        _stop_monitoring()
+        # Without a frame we are only shown a traceback whose frames have
+        # all finished running.
+        self._post_mortem = frame is None
+        _restore_breakpointhook()
+        if self._lines_off_frame is not None:
+            self._lines_off_frame.f_trace_lines = True
+            self._lines_off_frame = None
         # Restore the previous signal handler at the Pdb prompt.
         if Ldb._previous_sigint_handler:
             try:
@@ -455,6 +738,10 @@ class Ldb(bdb.Bdb):
             self.forget()
             return
 
+        # The program's output is block buffered when it is piped to the
+        # interface, so send whatever it printed before stopping.
+        self.flush_program_output()
+
         # At a break, there are 2 steps:
         # 1. Broadcast the snapshot for the interface to be updated
         self.broadcast_snapshot()
@@ -463,6 +750,15 @@ class Ldb(bdb.Bdb):
 
         self.forget()
 
+    @staticmethod
+    def flush_program_output():
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (AttributeError, ValueError, OSError):
+                # Replaced by something without flush(), or already closed.
+                pass
+
     def displayhook(self, obj):
         """Custom displayhook for the exec in default(), which prevents
         assignment of the _ variable in the builtins.
@@ -573,6 +869,8 @@ class Ldb(bdb.Bdb):
         except Exception:
             ret = []
         # Then, try to complete file names as well.
+        import glob
+
         globs = glob.glob(glob.escape(text) + "*")
         for fn in globs:
             if os.path.isdir(fn):
@@ -806,10 +1104,7 @@ class Ldb(bdb.Bdb):
     # To be overridden in derived debuggers
     def defaultFile(self):
         """Produce a reasonable default."""
-        filename = self.curframe.f_code.co_filename
-        if filename == "<string>" and self.mainpyfile:
-            filename = self.mainpyfile
-        return filename
+        return self.curframe.f_code.co_filename
 
     do_b = do_break
 
@@ -1132,7 +1427,10 @@ class Ldb(bdb.Bdb):
     do_unt = do_until
 
     def step_forward(self):
-        self.set_step()
+        if not self._monitor_step():
+            self._resume_tracing()
+            self.set_step()
+        self._install_stepping_breakpointhook()
         return DebugActionResult(DebugAction.STEP)
 
     def do_next(self, arg):
@@ -1147,14 +1445,272 @@ class Ldb(bdb.Bdb):
     do_n = do_next
 
     def next_line(self) -> DebugActionResult:
-        self.set_next(self.curframe)
+        if not self._monitor_next(self.curframe):
+            self._resume_tracing()
+            self.set_next(self.curframe)
+        self._install_stepping_breakpointhook()
         return DebugActionResult(DebugAction.NEXT)
 
+    def _install_stepping_breakpointhook(self):
+        global _saved_breakpointhook
+        if _saved_breakpointhook is None:
+            _saved_breakpointhook = sys.breakpointhook
+        sys.breakpointhook = self._stepping_breakpointhook
+        # Also set when stepping with settrace, which only traces this thread.
+        self._monitored_thread = _thread.get_ident()
+
+    def _stepping_breakpointhook(self, *args, **kws):
+        # A breakpoint() in the frame we are stepping through would only stop
+        # at the next line, where we stop anyway, so skip starting a new
+        # debugger for it. Other threads aren't being stepped, so theirs
+        # still start one.
+        if _thread.get_ident() == self._monitored_thread and (
+            self.stopframe is None or sys._getframe(1) is self.stopframe
+        ):
+            return
+        return _saved_breakpointhook(*args, **kws)
+
+    def _resume_tracing(self):
+        # A continue using sys.monitoring turns settrace off, so bdb's
+        # stepping needs it back on every frame of the stack.
+        if self._post_mortem or sys.gettrace() == self.trace_dispatch:
+            return
+        frame = self.curframe
+        while frame is not None:
+            # Tracing the debugger's own frames would stop inside it.
+            if not _is_debugger_code(frame.f_code):
+                frame.f_trace = self.trace_dispatch
+            frame = frame.f_back
+        sys.settrace(self.trace_dispatch)
+
+    # Stepping with sys.monitoring
+
+    def _can_monitor(self):
+        # Breakpoints need line events in every frame of their file, which
+        # bdb already handles, so only plain stepping is done here. In
+        # post-mortem nothing of the program is left to run, and the events
+        # would only fire in the debugger's and interpreter's own code.
+        return _MONITORING and not self.breaks and not self._post_mortem and _claim_monitoring()
+
+    def _start_monitoring(self, frame):
+        tool = sys.monitoring.DEBUGGER_ID
+        events = sys.monitoring.events
+        sys.settrace(_outer_trace)
+        self._monitored_frame = frame
+        # Events fire in every thread, but settrace only traced this one.
+        self._monitored_thread = _thread.get_ident()
+        # Pick the callbacks for this mode now, rather than checking the
+        # mode again on every event.
+        if frame is None:
+            on_line, on_return = self._monitor_step_line, self._monitor_step_return
+            on_raise, on_unwind = self._monitor_step_raise, self._monitor_step_unwind
+        else:
+            on_line, on_return = self._monitor_next_line, self._monitor_next_return
+            on_raise, on_unwind = self._monitor_next_raise, self._monitor_next_unwind
+        sys.monitoring.register_callback(tool, events.LINE, on_line)
+        sys.monitoring.register_callback(tool, events.PY_RETURN, on_return)
+        sys.monitoring.register_callback(tool, events.PY_YIELD, on_return)
+        # Exceptions stop where bdb's exception event would, and a frame left
+        # by one returns like bdb's return event. These events can only be
+        # enabled for all code, so their callbacks never return DISABLE.
+        sys.monitoring.register_callback(tool, events.RAISE, on_raise)
+        sys.monitoring.register_callback(tool, events.PY_UNWIND, on_unwind)
+
+    def _monitor_step(self):
+        """Stop at the next line or return in any frame."""
+        if not self._can_monitor():
+            return False
+        self._set_stopinfo(None, None)
+        self._start_monitoring(None)
+        tool = sys.monitoring.DEBUGGER_ID
+        events = sys.monitoring.events
+        # Stepping into a call, or into a generator or coroutine resuming,
+        # stops on it first, like Bdb's call event.
+        sys.monitoring.register_callback(tool, events.PY_START, self._monitor_step_call)
+        sys.monitoring.register_callback(tool, events.PY_RESUME, self._monitor_step_call)
+        sys.monitoring.set_events(
+            tool,
+            events.PY_START | events.PY_RESUME | events.LINE | events.PY_RETURN | events.PY_YIELD
+            | events.RAISE | events.PY_UNWIND,
+        )
+        return True
+
+    def _monitor_next(self, frame):
+        """Stop at the next line or return of *frame*, ignoring the frames it calls."""
+        if not self._can_monitor():
+            return False
+        if frame is self.frame_returning:
+            # The frame is already returning, so the next line is in its caller.
+            frame = frame.f_back
+            if frame is None or _is_debugger_code(frame.f_code):
+                return False
+        self._set_stopinfo(frame, None)
+        self._start_monitoring(frame)
+        events = sys.monitoring.events
+        sys.monitoring.set_events(sys.monitoring.DEBUGGER_ID, events.RAISE | events.PY_UNWIND)
+        sys.monitoring.set_local_events(
+            sys.monitoring.DEBUGGER_ID,
+            frame.f_code,
+            events.LINE | events.PY_RETURN | events.PY_YIELD,
+        )
+        _monitored_code.add(frame.f_code)
+        return True
+
+    def _monitor_continue(self):
+        """Run until a breakpoint, only watching calls outside files with breakpoints."""
+        if not (_MONITORING and self.breaks and not self._post_mortem and _claim_monitoring()):
+            return False
+        tool = sys.monitoring.DEBUGGER_ID
+        events = sys.monitoring.events
+        self._set_stopinfo(self.botframe, None, -1)
+        sys.settrace(_outer_trace)
+        self._monitored_thread = _thread.get_ident()
+        sys.monitoring.register_callback(tool, events.LINE, self._monitor_breakpoint)
+        sys.monitoring.register_callback(tool, events.PY_START, self._monitor_call)
+        sys.monitoring.register_callback(tool, events.PY_RESUME, self._monitor_call)
+        # Frames that are already running won't report PY_START.
+        frame = self.curframe
+        while frame is not None:
+            self._monitor_call(frame.f_code, 0)
+            frame = frame.f_back
+        sys.monitoring.set_events(tool, events.PY_START | events.PY_RESUME)
+        return True
+
+    def _monitor_call(self, code, instruction_offset):
+        if self.canonic(code.co_filename) in self.breaks:
+            sys.monitoring.set_local_events(
+                sys.monitoring.DEBUGGER_ID, code, sys.monitoring.events.LINE
+            )
+            _monitored_code.add(code)
+        # Either way this code object doesn't need to report calls any more.
+        return _disable_location()
+
+    def _monitor_breakpoint(self, code, line_number):
+        breaks = self.breaks.get(self.canonic(code.co_filename), ())
+        if line_number not in breaks and code.co_firstlineno not in breaks:
+            return _disable_location()
+        if _thread.get_ident() != self._monitored_thread:
+            return None
+        frame = sys._getframe(1)
+        if self.break_here(frame):
+            self.user_line(frame)
+            self._monitor_check_quit()
+
+    def _monitor_skipped(self, frame):
+        return self.skip and self.is_skipped_module(frame.f_globals.get("__name__"))
+
+    def _monitor_check_quit(self):
+        # Like Bdb's dispatch methods, end the program if the user quit at
+        # the stop that just finished.
+        if self.quitting:
+            _stop_monitoring()
+            raise bdb.BdbQuit
+
+    def _monitor_step_call(self, code, instruction_offset):
+        if _thread.get_ident() != self._monitored_thread:
+            return None
+        if _is_debugger_code(code):
+            return _disable_location()
+        frame = sys._getframe(1)
+        if self._monitor_skipped(frame):
+            return _disable_location()
+        self.user_call(frame, None)
+        self._monitor_check_quit()
+
+    def _monitor_step_line(self, code, line_number):
+        if _thread.get_ident() != self._monitored_thread:
+            return None
+        if _is_debugger_code(code):
+            return _disable_location()
+        frame = sys._getframe(1)
+        if self._monitor_skipped(frame):
+            # Stepping never stops in a skipped module, so this location can
+            # stay quiet until the next stop restarts events.
+            return _disable_location()
+        self.user_line(frame)
+        self._monitor_check_quit()
+
+    def _monitor_next_line(self, code, line_number):
+        frame = sys._getframe(1)
+        # Other (e.g. recursive) frames running the same code are ignored,
+        # which includes every frame of another thread.
+        if frame is self._monitored_frame:
+            self.user_line(frame)
+            self._monitor_check_quit()
+
+    def _monitor_step_return(self, code, instruction_offset, return_value):
+        if _thread.get_ident() != self._monitored_thread:
+            return None
+        if _is_debugger_code(code):
+            return _disable_location()
+        frame = sys._getframe(1)
+        if self._monitor_skipped(frame):
+            return _disable_location()
+        self._monitor_stop_at_return(frame, return_value)
+
+    def _monitor_next_return(self, code, instruction_offset, return_value):
+        frame = sys._getframe(1)
+        if frame is self._monitored_frame:
+            self._monitor_stop_at_return(frame, return_value)
+
+    def _monitor_step_raise(self, code, instruction_offset, exception):
+        if _thread.get_ident() != self._monitored_thread or _is_debugger_code(code):
+            return
+        frame = sys._getframe(1)
+        if not self._monitor_skipped(frame):
+            self._monitor_stop_at_exception(frame, exception)
+
+    def _monitor_next_raise(self, code, instruction_offset, exception):
+        frame = sys._getframe(1)
+        if frame is self._monitored_frame:
+            self._monitor_stop_at_exception(frame, exception)
+
+    def _monitor_step_unwind(self, code, instruction_offset, exception):
+        if _thread.get_ident() != self._monitored_thread or _is_debugger_code(code):
+            return
+        frame = sys._getframe(1)
+        if not self._monitor_skipped(frame):
+            # To bdb a frame left by an exception returns None.
+            self._monitor_stop_at_return(frame, None)
+
+    def _monitor_next_unwind(self, code, instruction_offset, exception):
+        frame = sys._getframe(1)
+        if frame is self._monitored_frame:
+            self._monitor_stop_at_return(frame, None)
+
+    def _monitor_stop_at_exception(self, frame, exception):
+        exc_traceback = exception.__traceback__
+        # Like Bdb.dispatch_exception, ignore the StopIteration a generator
+        # gets when a subiterator run by 'yield from' finishes.
+        if (
+            frame.f_code.co_flags & bdb.GENERATOR_AND_COROUTINE_FLAGS
+            and type(exception) is StopIteration
+            and exc_traceback is None
+        ):
+            return
+        self.user_exception(frame, (type(exception), exception, exc_traceback))
+        self._monitor_check_quit()
+
+    def _monitor_stop_at_return(self, frame, return_value):
+        self.frame_returning = frame
+        try:
+            self.user_return(frame, return_value)
+        finally:
+            self.frame_returning = None
+        self._monitor_check_quit()
+
     def restart_process(self):
         raise Restart
 
     def continue_to_function_return(self):
+        self._resume_tracing()
         self.set_return(self.curframe)
+        if self.canonic(self.curframe.f_code.co_filename) not in self.breaks:
+            # Only the return event of this frame matters now, so stop the
+            # interpreter from dispatching each of its remaining lines.
+            # Opcode events are never enabled.
+            self.curframe.f_trace_lines = False
+            self._lines_off_frame = self.curframe
         return DebugActionResult(DebugAction.RETURN)
 
     def continue_to_next_breakpoint(self) -> DebugActionResult:
@@ -1167,7 +1723,8 @@ class Ldb(bdb.Bdb):
                 # SIGINT set. Would printing a message here (once) make
                 # sense?
                 pass
-        self.set_continue()
+        if not self._monitor_continue():
+            self.set_continue()
         return DebugActionResult(DebugAction.CONTINUE)
 
     def do_jump(self, arg):
@@ -1314,6 +1871,8 @@ class Ldb(bdb.Bdb):
 
         Pretty-print the value of the expression.
         """
+        import pprint
+
         self._msg_val_func(arg, pprint.pformat)
 
     complete_print = _complete_expression
@@ -1517,6 +2076,8 @@ class Ldb(bdb.Bdb):
         Start an interactive interpreter whose global namespace
         contains all the (global and local) names found in the current scope.
         """
+        import code
+
         ns = {**self.curframe.f_globals, **self.curframe_locals}
         code.interact("*interactive*", local=ns)
 
@@ -1590,38 +2151,50 @@ class Ldb(bdb.Bdb):
 
     @staticmethod
     def clean_variable_names(variables: dict[str, Any]) -> list[Variable]:
-        extra_variables_to_ignore = {"copyright", "license"}
         return_variables = []
         for variable_name, variable_value in variables.items():
-            if variable_name.startswith("__") and variable_name.endswith("__"):
+            # Most names don't start with an underscore, which a single index
+            # rules out before the two method calls.
+            if variable_name[:1] == "_" and variable_name.startswith("__") and variable_name.endswith("__"):
+                continue
+            if variable_name in _IGNORED_VARIABLES:
                 continue
-            if variable_name in extra_variables_to_ignore:
+            value_type = type(variable_value)
+            if value_type in _HIDDEN_TYPES:
                 continue
-            if isinstance(variable_value, Callable):
+            if isinstance(variable_value, (types.ModuleType, Callable)):
                 continue
-            return_variables.append(Variable(variable_name, str(variable_value), variable_value.__class__.__name__))
+            try:
+                value_text = _format_value(variable_value)
+            except Exception:
+                # A broken __str__ or __repr__ in the program mustn't stop
+                # the whole snapshot from being sent.
+                value_text = object.__repr__(variable_value)
+            return_variables.append(Variable(variable_name, value_text, _type_name(value_type)))
         return return_variables
 
     def construct_snapshot(self) -> Snapshot:
         frames = []
+        # Frames of the same module share their globals, which can be large,
+        # so those are only cleaned once per snapshot.
+        module_variables = {}
 
-        for frame_lineno in self.stack:
-            frame, lineno = frame_lineno
-            file_name = frame.f_code.co_filename
-
-            if file_name == "<frozen runpy>":
-                continue
-            if file_name == "<string>":
-                continue
-            if "bdb.py" in file_name:
+        for frame, lineno in self.stack:
+            code = frame.f_code
+            if _is_debugger_code(code):
                 continue
-            if "ldb.py" in file_name:
-                continue
-
-            function_name = frame.f_code.co_name
-            local_variables = self.clean_variable_names(frame.f_locals)
-            global_variables = self.clean_variable_names(frame.f_globals)
-            frames.append(Frame(file_name, lineno, function_name, local_variables, global_variables))
+            # setup() already took the current frame's locals. Reading
+            # f_locals again would rebuild them (before 3.13), overwriting
+            # changes made through curframe_locals.
+            if frame is self.curframe:
+                local_variables = self.clean_variable_names(self.curframe_locals)
+            else:
+                local_variables = self.clean_variable_names(frame.f_locals)
+            global_variables = module_variables.get(id(frame.f_globals))
+            if global_variables is None:
+                global_variables = self.clean_variable_names(frame.f_globals)
+                module_variables[id(frame.f_globals)] = global_variables
+            frames.append(Frame(code.co_filename, lineno, code.co_name, local_variables, global_variables))
 
         return Snapshot(frames)
 
@@ -1836,7 +2409,12 @@ def set_trace(*, header=None):
     ldb = Ldb()
     if header is not None:
         ldb.message(header)
-    ldb.set_trace(sys._getframe().f_back)
+    frame = sys._getframe(1)
+    # Skip Ldb._stepping_breakpointhook if breakpoint() went through it.
+    back = frame.f_back
+    while back is not None and _is_debugger_code(frame.f_code):
+        frame, back = back, back.f_back
+    ldb.set_trace(frame)
 
 
 # Post-Mortem interface
@@ -1,5 +1,16 @@
+use std::collections::{HashMap, VecDeque};
+use std::fmt::Write;
+use std::fs::{metadata, read_to_string};
+use std::time::SystemTime;
+
 use serde::{Deserialize, Serialize};
 
+/// Number of output lines kept for the output panel; older lines are dropped.
+pub const MAX_OUTPUT_LINES: usize = 10_000;
+
+/// Number of characters kept of each output line; the rest is dropped.
+pub const MAX_OUTPUT_LINE_LENGTH: usize = 1_000;
+
 #[derive(Clone, Debug, Serialize, Deserialize)]
 pub struct Variable {
     pub name: String,
@@ -39,27 +50,110 @@ pub enum SelectedPanel {
     Output,
 }
 
-#[derive(Debug, Default)]
+impl SelectedPanel {
+    pub fn next(self) -> Self {
+        match self {
+            SelectedPanel::CallStack => SelectedPanel::Code,
+            SelectedPanel::Code => SelectedPanel::Variables,
+            SelectedPanel::Variables => SelectedPanel::Output,
+            SelectedPanel::Output => SelectedPanel::CallStack,
+        }
+    }
+
+    pub fn previous(self) -> Self {
+        match self {
+            SelectedPanel::CallStack => SelectedPanel::Output,
+            SelectedPanel::Code => SelectedPanel::CallStack,
+            SelectedPanel::Variables => SelectedPanel::Code,
+            SelectedPanel::Output => SelectedPanel::Variables,
+        }
+    }
+}
+
+#[derive(Clone, Copy, Debug, Default)]
 pub enum OutputType {
     #[default]
     Stdout,
     Stderr,
 }
 
+/// Cut `line` down to `MAX_OUTPUT_LINE_LENGTH` characters, noting how much was dropped.
+fn truncate_line(mut line: String) -> String {
+    if let Some((cut, _)) = line.char_indices().nth(MAX_OUTPUT_LINE_LENGTH) {
+        let dropped = line.len() - cut;
+        line.truncate(cut);
+        line.push_str(&format!(" ... ({} bytes truncated)", dropped));
+    }
+    line
+}
+
 #[derive(Debug, Default)]
 pub struct OutputLine {
     pub output_type: OutputType,
     pub contents: String,
 }
 
+/// The contents of a source file as of its last modification time, with the
+/// offset at which each line starts, so a line is a slice rather than a
+/// separate allocation.
+#[derive(Debug, Default)]
+pub struct SourceFile {
+    pub modified: Option<SystemTime>,
+    contents: String,
+    line_starts: Vec<usize>,
+}
+
+impl SourceFile {
+    pub fn new(modified: Option<SystemTime>, contents: String) -> Self {
+        let mut line_starts = vec![0];
+        line_starts.extend(contents.match_indices('\n').map(|(i, _)| i + 1));
+        // Like str::lines(), a final line ending doesn't start another line.
+        if line_starts.last() == Some(&contents.len()) {
+            line_starts.pop();
+        }
+        Self { modified, contents, line_starts }
+    }
+
+    pub fn len(&self) -> usize {
+        self.line_starts.len()
+    }
+
+    /// The line at `index` (counting from 0), without its line ending.
+    pub fn line(&self, index: usize) -> &str {
+        let start = self.line_starts[index];
+        let end = self.line_starts.get(index + 1).copied().unwrap_or(self.contents.len());
+        let line = &self.contents[start..end];
+        match line.strip_suffix('\n') {
+            Some(line) => line.strip_suffix('\r').unwrap_or(line),
+            None => line,
+        }
+    }
+}
+
+/// A variable as it is shown in the variables panel.
+#[derive(Debug, Default)]
+pub struct VariableLabel {
+    pub name: String,
+    pub value: String,
+    pub is_global: bool,
+}
+
 #[derive(Debug, Default)]
 pub struct App {
     pub should_quit: bool,
     pub snapshot: Snapshot,
+    /// "function:line" for each frame of the snapshot's stack.
+    pub stack_labels: Vec<String>,
     pub state: AppState,
     pub selected_panel: SelectedPanel,
     pub selected_frame: usize,
-    pub output: Vec<OutputLine>,
+    pub output: VecDeque<OutputLine>,
+    pub sources: HashMap<String, SourceFile>,
+    /// Variable labels of the selected frame. Their buffers are reused when
+    /// they are rebuilt for another snapshot or frame.
+    pub variable_labels: Vec<VariableLabel>,
+    /// The index of the frame `variable_labels` are current for, if any.
+    pub variable_labels_frame: Option<usize>,
 }
 
 impl App {
@@ -71,6 +165,66 @@ impl App {
         self.should_quit = true;
     }
 
+    pub fn set_snapshot(&mut self, snapshot: Snapshot) {
+        self.stack_labels = snapshot.stack.iter()
+            .map(|frame| format!("{}:{}", frame.function_name, frame.line_number))
+            .collect();
+        self.snapshot = snapshot;
+        self.state = AppState::Breakpoint;
+        self.selected_frame = self.snapshot.stack.len() - 1;
+        self.variable_labels_frame = None;
+    }
+
+    pub fn add_output(&mut self, output_type: OutputType, lines: Vec<String>) {
+        self.output.extend(lines.into_iter().map(|contents| OutputLine { output_type, contents: truncate_line(contents) }));
+        let excess = self.output.len().saturating_sub(MAX_OUTPUT_LINES);
+        self.output.drain(..excess);
+    }
+
+    /// Make sure the selected frame's file is in the source cache, reading it
+    /// again only if it changed on disk since it was last read.
+    pub fn load_selected_source(&mut self) {
+        // Index the stack directly rather than through get_selected_frame(),
+        // so the file name can stay borrowed while the cache is updated.
+        let Some(frame) = self.snapshot.stack.get(self.selected_frame) else {
+            return;
+        };
+        let file_name = &frame.file_name;
+        let modified = metadata(file_name).and_then(|metadata| metadata.modified()).ok();
+        let is_fresh = modified.is_some() && self.sources.get(file_name).is_some_and(|source| source.modified == modified);
+        if is_fresh {
+            return;
+        }
+        let contents = read_to_string(file_name).unwrap_or_else(|_| "could not read file".to_string());
+        self.sources.insert(file_name.clone(), SourceFile::new(modified, contents));
+    }
+
+    /// Make sure the variable labels of the selected frame are formatted. They
+    /// only change with the snapshot or the selected frame, not per redraw.
+    pub fn load_variable_labels(&mut self) {
+        if self.variable_labels_frame == Some(self.selected_frame) {
+            return;
+        }
+        // Index the stack directly so the labels can be updated while the
+        // frame is borrowed.
+        let Some(frame) = self.snapshot.stack.get(self.selected_frame) else {
+            self.variable_labels.clear();
+            self.variable_labels_frame = None;
+            return;
+        };
+        let variables = frame.local_variables.iter().map(|variable| (variable, false))
+            .chain(frame.global_variables.iter().map(|variable| (variable, true)));
+        self.variable_labels.resize_with(frame.local_variables.len() + frame.global_variables.len(), VariableLabel::default);
+        for (label, (variable, is_global)) in self.variable_labels.iter_mut().zip(variables) {
+            label.name.clear();
+            let _ = write!(label.name, "{:?} ", variable.name);
+            label.value.clear();
+            let _ = write!(label.value, "{:?}", variable.value);
+            label.is_global = is_global;
+        }
+        self.variable_labels_frame = Some(self.selected_frame);
+    }
+
     pub fn get_selected_frame(&self) -> Option<&Frame> {
         self.snapshot.stack.get(self.selected_frame)
     }
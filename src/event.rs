@@ -8,7 +8,7 @@ use anyhow::Result;
 use xml_rpc::{Server, Fault};
 use std::net::{IpAddr, Ipv4Addr, SocketAddr};
 
-use crate::app::Snapshot;
+use crate::app::{AppState, Snapshot};
 
 #[derive(Clone, Debug)]
 pub enum Event {
@@ -17,8 +17,9 @@ pub enum Event {
     Mouse(MouseEvent), // Mouse event
     Resize(u16, u16), // Terminal resize
     SnapshotReceived(Snapshot), // Snapshot received
-    StdoutReceived(String), // Stdout received
-    StderrReceived(String), // Stderr received
+    StdoutReceived(Vec<String>), // Stdout lines received
+    StderrReceived(Vec<String>), // Stderr lines received
+    RequestFailed(AppState), // Debugger request not delivered, with the state to go back to
 }
 
 #[derive(Debug)]
@@ -97,4 +98,10 @@ impl EventHandler {
     pub fn next(&self) -> Result<Event> {
         Ok(self.receiver.recv()?)
     }
+
+    /// Wait at most `timeout` for the next event. A zero timeout only returns
+    /// an event that is already queued.
+    pub fn next_timeout(&self, timeout: Duration) -> Option<Event> {
+        self.receiver.recv_timeout(timeout).ok()
+    }
 }
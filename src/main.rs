@@ -14,14 +14,75 @@ pub mod tui;
 pub mod update;
 
 use std::io::BufRead;
+use std::time::{Duration, Instant};
 
 use anyhow::Result;
-use app::{App, OutputType, OutputLine};
+use app::{App, OutputType};
 use event::{Event, EventHandler};
 use ratatui::{backend::CrosstermBackend, Terminal};
 use tui::Tui;
 use update::update;
 
+/// Shortest time between two draws. Events that arrive in between are all
+/// applied before the next draw.
+const MIN_DRAW_INTERVAL: Duration = Duration::from_millis(50);
+
+/// Forward the lines of a child process stream to the event loop.
+///
+/// Every complete line that is already buffered is sent in the same event, so
+/// a program printing heavily costs one event (and one redraw) per read rather
+/// than per line.
+fn forward_lines<R: std::io::Read>(stream: R, sender: std::sync::mpsc::Sender<Event>, to_event: fn(Vec<String>) -> Event) {
+    let mut reader = std::io::BufReader::new(stream);
+    loop {
+        let mut lines = vec![];
+        loop {
+            let mut line = String::new();
+            match reader.read_line(&mut line) {
+                Ok(0) | Err(_) => {
+                    if !lines.is_empty() {
+                        let _ = sender.send(to_event(lines));
+                    }
+                    return;
+                }
+                Ok(_) => {
+                    if line.ends_with('\n') {
+                        line.pop();
+                        if line.ends_with('\r') {
+                            line.pop();
+                        }
+                    }
+                    lines.push(line);
+                }
+            }
+            // Only read on while a complete line is buffered. A partial line
+            // (e.g. a prompt without a newline) would block read_line and
+            // hold back the lines already collected.
+            if !reader.buffer().contains(&b'\n') {
+                break;
+            }
+        }
+        if sender.send(to_event(lines)).is_err() {
+            return;
+        }
+    }
+}
+
+/// Apply an event to the app, returning whether the interface needs redrawing.
+fn handle_event(app: &mut App, event: Event, sender: &std::sync::mpsc::Sender<Event>) -> bool {
+    match event {
+        Event::Key(key_event) => update(app, key_event, sender),
+        Event::SnapshotReceived(snapshot) => app.set_snapshot(snapshot),
+        Event::StdoutReceived(stdout) => app.add_output(OutputType::Stdout, stdout),
+        Event::StderrReceived(stderr) => app.add_output(OutputType::Stderr, stderr),
+        Event::RequestFailed(state) => app.state = state,
+        Event::Resize(_, _) => {}
+        // Nothing on screen depends on ticks or (ignored) mouse events.
+        Event::Tick | Event::Mouse(_) => return false,
+    };
+    true
+}
+
 fn main() -> Result<()> {
     // Create an application.
     let mut app = App::new();
@@ -50,37 +111,36 @@ fn main() -> Result<()> {
     let stdout = python_process.stdout.take().unwrap();
     let stderr = python_process.stderr.take().unwrap();
 
-    std::thread::spawn(move || {
-        let stdout_lines = std::io::BufReader::new(stdout).lines();
-        for line in stdout_lines {
-            let _ = stdio_sender.send(Event::StdoutReceived(line.unwrap()));
-        }
-    });
-
-    std::thread::spawn(move || {
-        let stderr_lines = std::io::BufReader::new(stderr).lines();
-        for line in stderr_lines {
-            let _ = stderr_sender.send(Event::StderrReceived(line.unwrap()));
-        }
-    });
+    std::thread::spawn(move || forward_lines(stdout, stdio_sender, Event::StdoutReceived));
+    std::thread::spawn(move || forward_lines(stderr, stderr_sender, Event::StderrReceived));
 
 
     // Start the main loop.
+    let mut needs_redraw = true;
+    let mut last_draw = Instant::now();
     while !app.should_quit {
-        // Render the user interface.
-        tui.draw(&mut app)?;
-        // Handle events.
-        match tui.events.next()? {
-            Event::Key(key_event) => update(&mut app, key_event),
-            Event::SnapshotReceived(snapshot) => {
-                app.snapshot = snapshot;
-                app.state = app::AppState::Breakpoint;
-                app.selected_frame = app.snapshot.stack.len() - 1;
-            },
-            Event::StdoutReceived(stdout) => {app.output.push(OutputLine { output_type: OutputType::Stdout, contents: stdout });},
-            Event::StderrReceived(stderr) => {app.output.push(OutputLine { output_type: OutputType::Stderr, contents: stderr });},
-            _ => {}
-        };
+        // Render the user interface, unless nothing changed since last time.
+        if needs_redraw {
+            tui.draw(&mut app)?;
+            last_draw = Instant::now();
+        }
+        // Handle events. Everything that arrives until the next draw is due
+        // (held keys, bursts of output) is applied first, so a burst costs
+        // one redraw per interval rather than one per event. Once the draw is
+        // due it happens, even if more events are queued, so a steady stream
+        // of them can't hold it back.
+        needs_redraw = handle_event(&mut app, tui.events.next()?, &tui.events.sender);
+        let next_draw = last_draw + MIN_DRAW_INTERVAL;
+        while !app.should_quit {
+            let now = Instant::now();
+            if now >= next_draw {
+                break;
+            }
+            match tui.events.next_timeout(next_draw - now) {
+                Some(event) => needs_redraw |= handle_event(&mut app, event, &tui.events.sender),
+                None => break,
+            }
+        }
     }
 
     // Kill the Python process
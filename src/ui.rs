@@ -1,102 +1,111 @@
 use ratatui::{
     prelude::{Alignment, Constraint, Direction, Frame, Layout},
-    style::{Color, Style},
+    style::{Color, Modifier, Style},
     widgets::{Block, Borders, Paragraph},
     text::{Line, Span, Text},
 };
-use std::fs::read_to_string;
 
 use crate::app::{App, AppState, SelectedPanel};
 
-fn get_panel_contents<'a>(app: &'a App, this_panel: SelectedPanel) -> Vec<Line> {
+// Styles shared by the panels, built once rather than for every span.
+const DIM_STYLE: Style = Style::new().fg(Color::DarkGray);
+const HIGHLIGHT_STYLE: Style = Style::new().fg(Color::White).bg(Color::Red);
+const GLOBAL_MARKER_STYLE: Style = Style::new().fg(Color::DarkGray).add_modifier(Modifier::ITALIC);
+const TITLE_STYLE: Style = Style::new().fg(Color::Gray);
+const SELECTED_TITLE_STYLE: Style = Style::new().fg(Color::White).bg(Color::Blue);
+
+fn get_panel_contents<'a>(app: &'a App, this_panel: SelectedPanel, panel_height: u16) -> Vec<Line> {
     match this_panel {
         SelectedPanel::CallStack => {
-            let mut lines: Vec<Line> = vec![];
-            if app.snapshot.stack.is_empty() {
-                lines = vec![Line::from("".to_string())];
-            } else {
-                for (i, frame) in app.snapshot.stack.iter().enumerate() {
-                    lines.push(Line::from(vec![
-                        Span::styled(format!("{:2} ", i + 1), Style::default().fg(Color::DarkGray)),
-                        if i == app.selected_frame {
-                            Span::styled(format!("{}:{}", frame.function_name, frame.line_number), Style::default().fg(Color::White).bg(Color::Red))
-                        } else {
-                            Span::styled(format!("{}:{}", frame.function_name, frame.line_number), Style::default())
-                        }
-                ]));
-                }
+            if app.stack_labels.is_empty() {
+                // A panel with nothing to show draws no lines, and an empty
+                // Vec doesn't allocate.
+                return Vec::new();
             }
-            lines
+            // Collecting from the iterator allocates the lines in one go.
+            app.stack_labels.iter().enumerate().map(|(i, label)| {
+                Line::from(vec![
+                    Span::styled(format!("{:2} ", i + 1), DIM_STYLE),
+                    if i == app.selected_frame {
+                        Span::styled(label.as_str(), HIGHLIGHT_STYLE)
+                    } else {
+                        Span::styled(label.as_str(), Style::default())
+                    }
+                ])
+            }).collect()
         },
         SelectedPanel::Code => {
             let selected_frame = &app.get_selected_frame();
             if Option::is_none(selected_frame) {
-                return vec![Line::from("".to_string())];
+                return Vec::new();
             }
 
+            // render() has loaded the file into the source cache already.
             let file_name = &selected_frame.unwrap().file_name;
-            let file_contents = read_to_string(file_name).unwrap_or_else(|_| "could not read file".to_string());
-            let mut file_lines: Vec<Line> = vec![];
-            for (i, line) in file_contents.lines().enumerate() {
-                    file_lines.push(Line::from(vec![
-                    Span::styled(format!("{:4} ", i + 1), Style::default().fg(Color::DarkGray)),
-                    if i == selected_frame.unwrap().line_number as usize - 1 {
-                        Span::styled(line.to_string(), Style::default().fg(Color::White).bg(Color::Red))
+            let Some(source) = app.sources.get(file_name) else {
+                return Vec::new();
+            };
+            // Only build the lines that fit in the panel, centred on the
+            // current line when the file is taller than the panel.
+            let current_line = (selected_frame.unwrap().line_number as usize).saturating_sub(1);
+            let panel_height = panel_height as usize;
+            let first_line = if source.len() > panel_height {
+                current_line.saturating_sub(panel_height / 2)
+            } else {
+                0
+            };
+            let last_line = source.len().min(first_line + panel_height);
+            (first_line..last_line).map(|i| {
+                let line = source.line(i);
+                Line::from(vec![
+                    Span::styled(format!("{:4} ", i + 1), DIM_STYLE),
+                    if i == current_line {
+                        Span::styled(line, HIGHLIGHT_STYLE)
                     } else {
-                        Span::styled(line.to_string(), Style::default())
+                        Span::styled(line, Style::default())
                     }
-                ]));
-            }
-            file_lines
+                ])
+            }).collect()
         }
         SelectedPanel::Variables => {
-            let mut lines: Vec<Line> = vec![];
-            let selected_frame = &app.get_selected_frame();
-            if Option::is_none(selected_frame) {
-                return vec![Line::from("".to_string())];
-            }
-            let selected_frame = selected_frame.unwrap();
-            for variable in &selected_frame.local_variables {
-                lines.push(Line::from(vec![
-                    Span::styled(format!("{:?} ", variable.name), Style::default().fg(Color::DarkGray)),
-                    Span::styled(format!("{:?}", variable.value), Style::default()),
-                ]));
-            }
-            for variable in &selected_frame.global_variables {
-                lines.push(Line::from(vec![
-                    Span::styled(format!("{:?} ", variable.name), Style::default().fg(Color::DarkGray)),
-                    Span::styled(format!("{:?}", variable.value), Style::default()),
-                    Span::styled("(global)", Style::default().fg(Color::DarkGray).add_modifier(ratatui::style::Modifier::ITALIC)),
-                ]));
+            // render() has formatted the labels of the selected frame already.
+            if app.variable_labels_frame.is_none() {
+                return Vec::new();
             }
-            lines
+            app.variable_labels.iter().map(|label| {
+                let mut spans = Vec::with_capacity(3);
+                spans.push(Span::styled(label.name.as_str(), DIM_STYLE));
+                spans.push(Span::styled(label.value.as_str(), Style::default()));
+                if label.is_global {
+                    spans.push(Span::styled("(global)", GLOBAL_MARKER_STYLE));
+                }
+                Line::from(spans)
+            }).collect()
         },
         SelectedPanel::Output => {
-            let mut lines: Vec<Line> = vec![];
-            for output_line in &app.output {
-                lines.push(Line::from(vec![
-                    Span::styled(format!("{:?} ", output_line.output_type), Style::default().fg(Color::DarkGray)),
-                    Span::styled(output_line.contents.to_string(), Style::default()),
-                ]));
-            }
-            lines
+            // Only the most recent output fits in the panel (inside its
+            // borders), so don't build lines for anything older.
+            let visible_lines = panel_height.saturating_sub(2) as usize;
+            let skipped_lines = app.output.len().saturating_sub(visible_lines);
+            app.output.iter().skip(skipped_lines).map(|output_line| {
+                Line::from(vec![
+                    Span::styled(format!("{:?} ", output_line.output_type), DIM_STYLE),
+                    Span::styled(output_line.contents.as_str(), Style::default()),
+                ])
+            }).collect()
         }
     }
 }
 
 fn panel_widget<'a>(title: &'a str, app: &'a App, this_panel: SelectedPanel, panel_height: u16) -> Paragraph<'a> {
-    let mut style = Style::default().fg(Color::Gray);
-    if this_panel == app.selected_panel {
-        style = Style::default().fg(Color::White).bg(Color::Blue);
-    }
-    let panel_contents = get_panel_contents(app, this_panel);
+    let style = if this_panel == app.selected_panel { SELECTED_TITLE_STYLE } else { TITLE_STYLE };
+    let panel_contents = get_panel_contents(app, this_panel, panel_height);
     let contents_height = panel_contents.len() as u16;
     let contents_string = Text::from(panel_contents);
 
     let mut scroll_amount: u16 = 0;
     if contents_height > panel_height {
         scroll_amount = match this_panel {
-            SelectedPanel::Code => app.get_selected_frame().map(|frame| frame.line_number as u16).unwrap_or(0) - 1,
             SelectedPanel::CallStack => app.selected_frame as u16,
             _ => 0,
         };
@@ -148,9 +157,11 @@ pub fn render(app: &mut App, frame: &mut Frame) {
 
     frame.render_widget(panel_widget("call stack", app, SelectedPanel::CallStack, top_panel_height), top_panels[0]);
 
-    let file_name = app.get_selected_frame().map(|frame| frame.file_name.clone()).unwrap_or("code".to_string());
-    frame.render_widget(panel_widget(&file_name, app, SelectedPanel::Code, top_panel_height), top_panels[1]);
+    app.load_selected_source();
+    let file_name = app.get_selected_frame().map_or("code", |frame| frame.file_name.as_str());
+    frame.render_widget(panel_widget(file_name, app, SelectedPanel::Code, top_panel_height), top_panels[1]);
 
+    app.load_variable_labels();
     frame.render_widget(panel_widget("variables", app, SelectedPanel::Variables, bottom_panel_height), bottom_panels[0]);
 
     frame.render_widget(panel_widget("output", app, SelectedPanel::Output, bottom_panel_height), bottom_panels[1]);
@@ -1,7 +1,9 @@
 use crossterm::event::{KeyCode, KeyEvent};
 use serde::{Deserialize, Serialize};
+use std::{sync::mpsc, thread};
 
 use crate::app::{App, SelectedPanel, AppState};
+use crate::event::Event;
 
 #[derive(Clone, Debug, Serialize, Deserialize)]
 struct DebugAction {
@@ -17,61 +19,45 @@ struct DebugActionResult {
     message: String,
 }
 
-fn send_rpc_request(request_data: DebugAction) -> Result<DebugActionResult, xml_rpc::Fault> {
+/// Send a request to the debugger, returning whether it was delivered.
+fn send_rpc_request(request_data: DebugAction) -> bool {
     let mut client = xml_rpc::Client::new().unwrap();
     let url = xml_rpc::Url::parse("http://127.0.0.1:8081").unwrap();
 
-    let response: Result<_, xml_rpc::Fault> = client
+    // A fault still means that the debugger received the request; only an
+    // error means that it isn't listening (e.g. because code is running).
+    client
         .call::<&str, &DebugAction, DebugActionResult>(
             &url,
             "interact_with_debugger",
             &request_data,
         )
-        .unwrap();
-
-    response
+        .is_ok()
 }
 
-pub fn update(app: &mut App, key_event: KeyEvent) {
-    let panel_order = [
-        SelectedPanel::CallStack,
-        SelectedPanel::Code,
-        SelectedPanel::Variables,
-        SelectedPanel::Output,
-    ];
+/// Send `requested_action` to the debugger without blocking the interface.
+///
+/// The app moves to `new_state` straight away. If the request can't be
+/// delivered, the previous state comes back as an `Event::RequestFailed`.
+fn request_action(app: &mut App, sender: &mpsc::Sender<Event>, requested_action: &str, new_state: AppState) {
+    let previous_state = std::mem::replace(&mut app.state, new_state);
+    let request_data = DebugAction { requested_action: requested_action.to_string(), arguments: vec![], };
+    let sender = sender.clone();
+    thread::spawn(move || {
+        if !send_rpc_request(request_data) {
+            let _ = sender.send(Event::RequestFailed(previous_state));
+        }
+    });
+}
 
+pub fn update(app: &mut App, key_event: KeyEvent, sender: &mpsc::Sender<Event>) {
     match key_event.code {
         KeyCode::Esc | KeyCode::Char('q') => app.quit(),
-        KeyCode::Char('c') => {
-            if send_rpc_request(DebugAction { requested_action: "continue".to_string(), arguments: vec![], }).is_ok() {
-                app.state = AppState::RunningCode;
-            }
-        },
-        KeyCode::Char('n') => {
-            if send_rpc_request(DebugAction { requested_action: "next".to_string(), arguments: vec![], }).is_ok() {
-                app.state = AppState::RunningCode;
-            }
-        },
-        KeyCode::Char('t') => {
-            if send_rpc_request(DebugAction { requested_action: "stop".to_string(), arguments: vec![], }).is_ok() {
-                app.state = AppState::Idle;
-            }
-        },
-        KeyCode::Tab => {
-            let current_panel_index = panel_order
-                .iter()
-                .position(|&panel| panel == app.selected_panel)
-                .unwrap();
-            app.selected_panel = panel_order[(current_panel_index + 1) % panel_order.len()];
-        },
-        KeyCode::BackTab => {
-            let current_panel_index = panel_order
-                .iter()
-                .position(|&panel| panel == app.selected_panel)
-                .unwrap();
-            app.selected_panel =
-                panel_order[(current_panel_index + panel_order.len() - 1) % panel_order.len()];
-        },
+        KeyCode::Char('c') => request_action(app, sender, "continue", AppState::RunningCode),
+        KeyCode::Char('n') => request_action(app, sender, "next", AppState::RunningCode),
+        KeyCode::Char('t') => request_action(app, sender, "stop", AppState::Idle),
+        KeyCode::Tab => app.selected_panel = app.selected_panel.next(),
+        KeyCode::BackTab => app.selected_panel = app.selected_panel.previous(),
         KeyCode::Char('j') | KeyCode::Down => {
             match app.selected_panel {
                 SelectedPanel::CallStack => {